@@ -0,0 +1,15 @@
+# File: _tkroot.py
+
+import functools
+import tkinter as tk
+
+@functools.lru_cache(maxsize=None)
+def root():
+    """
+    Returns the hidden Tkinter root window shared by all dialogs, creating it on first use.
+    Creating a Tk root starts a Tcl interpreter, so it's done once per process rather than
+    once per dialog helper.
+    """
+    tk_root = tk.Tk()
+    tk_root.withdraw()
+    return tk_root
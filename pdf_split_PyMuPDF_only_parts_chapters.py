@@ -2,20 +2,43 @@
 
 import os
 import re
-import tkinter as tk
+import string
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from tkinter import filedialog, messagebox
+import _tkroot # Shared, lazily created hidden Tk root
 import fitz  # PyMuPDF is imported as fitz
 from tqdm.tk import tqdm # Using tqdm.tk for a tkinter-compatible progress bar
 import unicodedata # For more robust character sanitization
 
+# --- REVISED REGEX PATTERN: More flexible for CHAPTER and PART headings ---
+# This regex is designed to be more forgiving with whitespace and potential leading/trailing characters
+# that might be part of the text extraction but not the core title.
+# It still prioritizes lines that clearly start with "PART" or "CHAPTER".
+# All patterns are compiled once at import time rather than on every call.
+_TITLE_RE = re.compile(
+    r'(?im)^\s*(?:'  # Case-insensitive, multiline; optional leading whitespace
+    r'PART\s+(?:[IVXLCDM]+\b|\d+\b)|'  # Matches "PART I", "PART 1", etc.
+    r'Chapter\s+\d+\b'  # Matches "Chapter 1", "Chapter 2", etc.
+    r')'
+    r'(.{0,100})$' # Captures the rest of the line as the title (now allows 0 chars for just "PART X")
+)
+_WS_RE = re.compile(r'\s+') # Whitespace runs, collapsed to '_' in filenames
+# Deletes every ASCII character not allowed in filenames (titles are ASCII-folded first)
+_UNSAFE_CHARS_TABLE = str.maketrans('', '', ''.join(
+    c for c in map(chr, range(128)) if c not in string.ascii_letters + string.digits + '_-'
+))
+_SCAN_LINES = 20 # Only the top of each page is searched for a heading
+_SCAN_CHUNK_PAGES = 64 # Pages handed to a scanning worker process at a time
+_MAX_WRITE_WORKERS = 8 # Upper bound on processes writing sections at once
+
 def select_file_and_directory():
     """
     Opens file dialogs for the user to select an input PDF and an output folder.
     Returns the file path and directory path as a tuple.
     """
-    # Initialize Tkinter root window but keep it hidden
-    root = tk.Tk()
-    root.withdraw() 
+    # Reuse the shared hidden Tkinter root instead of creating a new one
+    _tkroot.root()
     
     input_pdf_path = filedialog.askopenfilename(
         title="Select a PDF file",
@@ -36,106 +59,146 @@ def select_file_and_directory():
         
     return input_pdf_path, output_folder_path
 
+def _line_limit(text, max_lines):
+    """
+    Returns the offset at which the first max_lines lines of text end.
+    """
+    end = -1
+    for _ in range(max_lines):
+        end = text.find('\n', end + 1)
+        if end == -1:
+            return len(text)
+    return end
+
+def _scan_page_range(pdf_path, start, stop):
+    """
+    Scans pages [start, stop) of the PDF for 'PART' and 'CHAPTER' titles.
+    Runs in a worker process, so it opens its own copy of the document.
+    Returns a list of (page_index, title) tuples in page order.
+    """
+    matches = []
+    with fitz.open(pdf_path) as doc:
+        for i in range(start, stop):
+            try:
+                page = doc.load_page(i)
+                # Use get_text("text") for a plain text representation
+                text = page.get_text("text") 
+                if not text:
+                    continue
+
+                # _TITLE_RE is MULTILINE, so a single search finds the first title line on the
+                # page without splitting the text into a list of lines first. Headings sit at
+                # the top of the page, so only the first few lines are searched.
+                match = _TITLE_RE.search(text, 0, _line_limit(text, _SCAN_LINES))
+                if match:
+                    # Use the full matched line as the title
+                    matches.append((i, match.group(0).strip()))
+                        
+            except Exception as e:
+                print(f"Warning: Error extracting text from page {i + 1} with PyMuPDF: {e}. Skipping this page for title detection.")
+                continue
+    return matches
+
+def _section_filename(title, start_page_index):
+    """
+    Builds the output filename for a section: a zero-padded page number prefix
+    followed by an ASCII-only, filesystem-safe version of the title.
+    """
+    # --- ENHANCED FILENAME SANITIZATION AND PAGE NUMBER ADDITION ---
+    # NFKD folding is a no-op on plain ASCII titles, which is the common case
+    if title.isascii():
+        normalized_title = title
+    else:
+        normalized_title = unicodedata.normalize('NFKD', title).encode('ascii', 'ignore').decode('utf-8')
+    safe_title = _WS_RE.sub('_', normalized_title)
+    safe_title = safe_title.translate(_UNSAFE_CHARS_TABLE)
+    safe_title = safe_title.strip('_') 
+    safe_title = safe_title[:90] # Reduced length slightly to accommodate page number
+
+    # Format the page number for inclusion
+    page_number_str = f"Page_{start_page_index + 1:04d}" # Formats as "Page_0001", "Page_0010" etc.
+
+    # Construct the final filename with page number prefix
+    return f"{page_number_str}_{safe_title}.pdf"
+
+def _write_section(pdf_path, start_page_index, end_page_index, output_path):
+    """
+    Writes pages [start_page_index, end_page_index) of the PDF to output_path.
+    Runs in a worker process, so it opens its own copy of the source document.
+    """
+    with fitz.open(pdf_path) as doc, fitz.open() as new_pdf:
+        # Insert pages from the original document into the new document
+        new_pdf.insert_pdf(doc, 
+                           from_page=start_page_index, 
+                           to_page=end_page_index - 1)
+        # These are PyMuPDF's defaults, spelled out on purpose: insert_pdf already copies the
+        # source streams compressed, and the save should keep writing them back unchanged
+        new_pdf.save(output_path, garbage=0, deflate=False, clean=False)
+
 def split_pdf_by_content(input_pdf_path, output_folder):
     """
     Splits a PDF into multiple smaller PDFs by finding only 'PART' and 'CHAPTER' titles in the content.
     Includes enhanced filename sanitization and page numbers in the filenames.
     This version has a more flexible regex to catch more variations.
     """
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder)
+    os.makedirs(output_folder, exist_ok=True)
 
     try:
         # Open the PDF document using PyMuPDF
         doc = fitz.open(input_pdf_path)
-        
-        # --- REVISED REGEX PATTERN: More flexible for CHAPTER and PART headings ---
-        # This regex is designed to be more forgiving with whitespace and potential leading/trailing characters
-        # that might be part of the text extraction but not the core title.
-        # It still prioritizes lines that clearly start with "PART" or "CHAPTER".
-        title_pattern = re.compile(
-            r'^\s*(?:'  # Optional leading whitespace
-            r'PART\s+(?:[IVXLCDM]+\b|\d+\b)|'  # Matches "PART I", "PART 1", etc.
-            r'Chapter\s+\d+\b'  # Matches "Chapter 1", "Chapter 2", etc.
-            r')'
-            r'(.{0,100})$', # Captures the rest of the line as the title (now allows 0 chars for just "PART X")
-            re.IGNORECASE | re.MULTILINE 
-        )
+        n_pages = doc.page_count # Looked up once; len(doc) calls into MuPDF every time
 
         split_points = []
+        last_hit = -1 # Page index of the most recent split point
         
         print(f"Analyzing PDF for 'PART' and 'CHAPTER' titles in '{input_pdf_path}' using PyMuPDF...")
-        # Iterate through pages using PyMuPDF's page loading
-        for i in tqdm(range(len(doc)), desc="Scanning pages for titles"):
-            try:
-                page = doc.load_page(i)
-                # Use get_text("text") for a plain text representation
-                text = page.get_text("text") 
-                if not text:
-                    continue
-                    
-                # Process lines to find titles, prioritizing the first strong match on the page
-                lines = text.split('\n')
-                for line in lines:
-                    line = line.strip()
-                    match = title_pattern.match(line)
-                    if match:
-                        # Use the full matched line as the title
-                        title = match.group(0).strip() 
-                        # Ensure we don't add duplicate split points if multiple matches on same page
-                        if not split_points or split_points[-1]['start_page'] != i:
-                            split_points.append({'title': title, 'start_page': i})
-                        break # Move to the next page after finding the first title on this page
-                        
-            except Exception as e:
-                print(f"Warning: Error extracting text from page {i + 1} with PyMuPDF: {e}. Skipping this page for title detection.")
-                continue
+        # Text extraction dominates on large books, so page ranges are scanned in parallel
+        # worker processes. map() yields results in submission order, so the matches come
+        # back already sorted by page index.
+        range_starts = range(0, n_pages, _SCAN_CHUNK_PAGES)
+        range_stops = [min(start + _SCAN_CHUNK_PAGES, n_pages) for start in range_starts]
+        with ProcessPoolExecutor() as executor, tqdm(total=n_pages, desc="Scanning pages for titles") as pbar:
+            results = executor.map(_scan_page_range, repeat(input_pdf_path), range_starts, range_stops)
+            for start, stop, matches in zip(range_starts, range_stops, results):
+                for page_index, title in matches:
+                    # Ensure we don't add duplicate split points if multiple matches on same page
+                    if page_index != last_hit:
+                        split_points.append({'title': title, 'start_page': page_index})
+                        last_hit = page_index
+                pbar.update(stop - start)
 
         if not split_points:
             messagebox.showinfo("Information", "No suitable 'PART' or 'CHAPTER' titles found for splitting. Please ensure these headings exist in your document and try adjusting the regex pattern further if needed.")
             return
 
         # Add the end of the document as the final split point
-        split_points.append({'title': 'END_OF_DOCUMENT', 'start_page': len(doc)})
+        split_points.append({'title': 'END_OF_DOCUMENT', 'start_page': n_pages})
 
         print(f"Found {len(split_points) - 1} potential split points. Starting PDF splitting...")
+        # Work out every section and its output filename up front, so empty sections are
+        # dropped before an output document is ever created for them
+        sections = []
+        output_prefix = os.path.join(output_folder, '') # Folder path with a trailing separator
         for i in range(len(split_points) - 1):
             start_page_index = split_points[i]['start_page']
             end_page_index = split_points[i+1]['start_page']
             title = split_points[i]['title']
-            
-            # Create a new blank PDF document for the current split
-            new_pdf = fitz.open()
-            
+
             # Check if there are pages to add for the current section
             if end_page_index > start_page_index:
-                with tqdm(total=end_page_index - start_page_index, desc=f"Writing '{title[:30]}...'") as pbar:
-                    # Insert pages from the original document into the new document
-                    new_pdf.insert_pdf(doc, 
-                                       from_page=start_page_index, 
-                                       to_page=end_page_index - 1)
-                    pbar.update(end_page_index - start_page_index) # Update progress bar once for the block
-
-                # --- ENHANCED FILENAME SANITIZATION AND PAGE NUMBER ADDITION ---
-                normalized_title = unicodedata.normalize('NFKD', title).encode('ascii', 'ignore').decode('utf-8')
-                safe_title = re.sub(r'\s+', '_', normalized_title) 
-                safe_title = re.sub(r'[^a-zA-Z0-9_\-]', '', safe_title) 
-                safe_title = safe_title.strip('_') 
-                safe_title = safe_title[:90] # Reduced length slightly to accommodate page number
-
-                # Format the page number for inclusion
-                page_number_str = f"Page_{start_page_index + 1:04d}" # Formats as "Page_0001", "Page_0010" etc.
-
-                # Construct the final filename with page number prefix
-                filename = f"{page_number_str}_{safe_title}.pdf"
-                output_path = os.path.join(output_folder, filename)
-
-                new_pdf.save(output_path)
-                print(f"Created '{output_path}' with pages {start_page_index + 1} to {end_page_index}.")
+                output_path = output_prefix + _section_filename(title, start_page_index)
+                sections.append((start_page_index, end_page_index, output_path))
             else:
                 print(f"Skipping empty section: '{title}' (pages {start_page_index + 1} to {end_page_index}).")
-            
-            new_pdf.close()
+
+        # Sections don't depend on each other, so they're written in parallel. PyMuPDF isn't
+        # thread-safe, so this uses worker processes, each with its own copy of the source.
+        with ProcessPoolExecutor(max_workers=min(_MAX_WRITE_WORKERS, os.cpu_count() or 1)) as executor:
+            futures = [executor.submit(_write_section, input_pdf_path, start_page_index, end_page_index, output_path)
+                       for start_page_index, end_page_index, output_path in sections]
+            for (start_page_index, end_page_index, output_path), future in zip(sections, futures):
+                future.result() # Re-raises any error from the worker
+                print(f"Created '{output_path}' with pages {start_page_index + 1} to {end_page_index}.")
         
         doc.close()
         messagebox.showinfo("Success", "PDF splitting complete!")
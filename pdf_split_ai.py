@@ -1,22 +1,42 @@
 # File: gemini_bookmark_creator.py
 
 import os
+import re
 import json
-import tkinter as tk
+import shutil
+import asyncio
+import tempfile
+import threading
 from tkinter import filedialog, messagebox
-from PyPDF2 import PdfReader, PdfWriter
+import _tkroot # Shared, lazily created hidden Tk root
+import fitz  # PyMuPDF is imported as fitz
 import google.generativeai as genai
 from tqdm import tqdm
 
+try:
+    import orjson # Optional: noticeably faster than json on large tables of contents
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 # Configure the Gemini API with your API key
 genai.configure(api_key="YOUR_API_KEY")
 
+# Number of PDFs being uploaded to / analyzed by Gemini at the same time
+_MAX_CONCURRENT_REQUESTS = 8
+
+# PyMuPDF isn't thread-safe, so the worker threads writing bookmarks take turns
+_FITZ_LOCK = threading.Lock()
+
+# Outermost {...} in a response; Gemini often wraps its JSON in a ```json fence or a sentence
+_JSON_OBJECT_RE = re.compile(r'\{.*\}', re.DOTALL)
+
 def select_input_folder():
     """
     Opens a file dialog to allow the user to select the folder with the split PDFs.
     """
-    root = tk.Tk()
-    root.withdraw()
+    # Reuse the shared hidden Tkinter root instead of creating a new one
+    _tkroot.root()
     
     input_folder_path = filedialog.askdirectory(
         title="Select the folder containing the split PDFs"
@@ -24,9 +44,88 @@ def select_input_folder():
     
     return input_folder_path
 
-def add_bookmarks_with_gemini(input_folder):
+def _write_bookmarks(pdf_path, bookmark_data):
+    """
+    Replaces the PDF's outline with the given {title: page_number} bookmarks and
+    returns how many were written. If none of them point at a page in the file,
+    the existing outline is kept and nothing is saved.
+    The outline is saved as an incremental update, so the page content already
+    in the file is left as-is instead of being re-serialized. Files MuPDF had to
+    repair on open can't be updated incrementally; those are saved in full to a
+    temporary file next to the original, which then replaces it.
+    """
+    with _FITZ_LOCK, fitz.open(pdf_path) as doc:
+        toc = [[1, title, page_num] for title, page_num in bookmark_data.items()
+               if 1 <= page_num <= doc.page_count]
+        if not toc:
+            return 0 # set_toc([]) would delete the existing outline
+        doc.set_toc(toc)
+        if doc.can_save_incrementally():
+            doc.save(pdf_path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+            return len(toc)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(pdf_path), suffix=".pdf")
+        os.close(fd)
+        try:
+            doc.save(tmp_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+    # The original is only replaced once the document holding it open is closed.
+    # mkstemp creates the file as 0600, so it takes over the original's permissions first.
+    shutil.copymode(pdf_path, tmp_path)
+    os.replace(tmp_path, pdf_path)
+    return len(toc)
+
+async def _process_pdf(model, pdf_path, semaphore, pbar):
+    """
+    Uploads one PDF to Gemini, asks it for the document's headings and writes them
+    back as bookmarks. Blocking SDK calls run in worker threads so other
+    files can make progress while this one waits on the network.
+    """
+    filename = os.path.basename(pdf_path)
+    pdf_file_part = None
+
+    async with semaphore:
+        try:
+            pdf_file_part = await asyncio.to_thread(genai.upload_file, pdf_path)
+            
+            prompt = (
+                "Analyze this document and list all chapter titles, section headings, "
+                "and subheadings with their page numbers. "
+                "Format the output as a JSON object where the keys are the titles and the values are the page numbers. "
+                'Example: {"Chapter 1: Introduction": 1, "1.1 A new beginning": 2}'
+            )
+            
+            response = await model.generate_content_async([prompt, pdf_file_part])
+            
+            # Parse the JSON object out of whatever surrounds it rather than
+            # discarding the file (and the upload) over a markdown fence
+            json_match = _JSON_OBJECT_RE.search(response.text)
+            try:
+                bookmark_data = _json_loads(json_match.group(0)) if json_match else None
+            except ValueError:
+                bookmark_data = None
+            if not bookmark_data or not isinstance(bookmark_data, dict):
+                print(f"Could not decode JSON from Gemini for {filename}. Skipping.")
+                return
+            
+            # A file that can't be updated incrementally is saved in full, which can take a
+            # while, so the write runs in a worker thread instead of stalling the other files
+            if not await asyncio.to_thread(_write_bookmarks, pdf_path, bookmark_data):
+                print(f"None of Gemini's bookmarks for {filename} are within the page range. Skipping.")
+            
+        except Exception as e:
+            print(f"An error occurred with Gemini on {filename}: {e}")
+        finally:
+            pbar.set_description(f"Completed: {filename}")
+            pbar.update(1)
+            if pdf_file_part is not None:
+                await asyncio.to_thread(genai.delete_file, pdf_file_part.name)
+
+async def add_bookmarks_with_gemini(input_folder):
     """
     Uses Gemini 1.5 Flash to analyze PDFs and add sub-bookmarks.
+    Up to _MAX_CONCURRENT_REQUESTS PDFs are in flight with Gemini at once.
     """
     model = genai.GenerativeModel('gemini-1.5-flash-latest')
 
@@ -36,51 +135,14 @@ def add_bookmarks_with_gemini(input_folder):
 
     # Get a list of all PDF files to process
     pdf_files = [f for f in os.listdir(input_folder) if f.endswith(".pdf")]
+    semaphore = asyncio.Semaphore(_MAX_CONCURRENT_REQUESTS)
 
     # Use tqdm to show a progress bar for the entire process
     with tqdm(total=len(pdf_files), desc="Processing PDFs with Gemini") as pbar:
-        for filename in pdf_files:
-            pdf_path = os.path.join(input_folder, filename)
-            
-            try:
-                pdf_file_part = genai.upload_file(pdf_path)
-                
-                prompt = (
-                    "Analyze this document and list all chapter titles, section headings, "
-                    "and subheadings with their page numbers. "
-                    "Format the output as a JSON object where the keys are the titles and the values are the page numbers. "
-                    "Example: {'Chapter 1: Introduction': 1, '1.1 A new beginning': 2}"
-                )
-                
-                response = model.generate_content([prompt, pdf_file_part])
-                
-                try:
-                    bookmark_data = json.loads(response.text)
-                except json.JSONDecodeError:
-                    print(f"Could not decode JSON from Gemini for {filename}. Skipping.")
-                    continue
-                
-                writer = PdfWriter()
-                reader = PdfReader(pdf_path)
-                
-                for page in reader.pages:
-                    writer.add_page(page)
-
-                for title, page_num in bookmark_data.items():
-                    page_index = page_num - 1
-                    if 0 <= page_index < len(reader.pages):
-                        writer.add_outline_entry(title, page_index)
-                
-                with open(pdf_path, 'wb') as output_file:
-                    writer.write(output_file)
-                
-            except Exception as e:
-                print(f"An error occurred with Gemini on {filename}: {e}")
-            finally:
-                pbar.set_description(f"Completed: {filename}")
-                pbar.update(1)
-                if 'pdf_file_part' in locals():
-                    genai.delete_file(pdf_file_part.name)
+        await asyncio.gather(*(
+            _process_pdf(model, os.path.join(input_folder, filename), semaphore, pbar)
+            for filename in pdf_files
+        ))
     
     messagebox.showinfo("Success", "Gemini bookmarking complete!")
 
@@ -89,4 +151,4 @@ if __name__ == "__main__":
     
     if split_pdfs_folder:
         print("--- Adding new bookmarks with Gemini 1.5 Flash ---")
-        add_bookmarks_with_gemini(split_pdfs_folder)
\ No newline at end of file
+        asyncio.run(add_bookmarks_with_gemini(split_pdfs_folder))
\ No newline at end of file
@@ -1,12 +1,12 @@
 # File: pdf_splitter_gui.py
 import sys
-import PyPDF2
+import pypdf
 print("Python Executable Path:", sys.executable)
-print("PyPDF2 version:", PyPDF2.__version__)
+print("pypdf version:", pypdf.__version__)
 import os
-import tkinter as tk
 from tkinter import filedialog, messagebox
-from PyPDF2 import PdfReader, PdfWriter
+import _tkroot # Shared, lazily created hidden Tk root
+from pypdf import PdfReader, PdfWriter
 from tqdm.tk import tqdm
 
 def select_file_and_directory():
@@ -14,8 +14,8 @@ def select_file_and_directory():
     Opens file dialogs for the user to select an input PDF and an output folder.
     Returns the file path and directory path as a tuple.
     """
-    root = tk.Tk()
-    root.withdraw()
+    # Reuse the shared hidden Tkinter root instead of creating a new one
+    _tkroot.root()
     
     input_pdf_path = filedialog.askopenfilename(
         title="Select a PDF file",
@@ -44,6 +44,8 @@ def split_pdf_by_bookmarks(input_pdf_path, output_folder):
     try:
         with open(input_pdf_path, 'rb') as file:
             reader = PdfReader(file)
+            # Materialize the page list once; every section is sliced out of it below
+            pages_list = list(reader.pages)
             all_bookmarks = reader.outline
 
             if not all_bookmarks:
@@ -76,18 +78,16 @@ def split_pdf_by_bookmarks(input_pdf_path, output_folder):
             bookmark_data.sort(key=lambda x: x['start_page'])
 
             # Add the end of the document as a final split point
-            bookmark_data.append({'title': 'END', 'start_page': len(reader.pages)})
+            bookmark_data.append({'title': 'END', 'start_page': len(pages_list)})
 
-            for i in range(len(bookmark_data) - 1):
+            for i in tqdm(range(len(bookmark_data) - 1), desc="Splitting PDF by bookmarks"):
                 start_page = bookmark_data[i]['start_page']
                 end_page = bookmark_data[i+1]['start_page']
                 title = bookmark_data[i]['title']
 
                 writer = PdfWriter()
-                with tqdm(total=end_page - start_page, desc=f"Splitting '{title}'") as pbar:
-                    for page_num in range(start_page, end_page):
-                        writer.add_page(reader.pages[page_num])
-                        pbar.update(1)
+                for page in pages_list[start_page:end_page]:
+                    writer.add_page(page)
 
                 filename = f"{title.replace(' ', '_').replace('/', '-')}.pdf"
                 output_path = os.path.join(output_folder, filename)
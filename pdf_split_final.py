@@ -2,19 +2,38 @@
 
 import os
 import re
-import tkinter as tk
+import string
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from tkinter import filedialog, messagebox
+import _tkroot # Shared, lazily created hidden Tk root
 import fitz  # PyMuPDF is imported as fitz
 from tqdm.tk import tqdm # Using tqdm.tk for a tkinter-compatible progress bar
 import unicodedata # For more robust character sanitization
 
+# Regex to find PART/CHAPTER prefix, with a capturing group for the number (Roman or Arabic),
+# and a second group for the text AFTER it, so one pass yields both heading and description.
+# All patterns are compiled once at import time rather than on every call. Flags are given
+# inline: case-insensitive, and dot matches newline so the description can span lines.
+_TITLE_RE = re.compile(
+    r'(?is)^\s*(PART\s+(?:[IVXLCDM]+\b|\d+\b)|Chapter\s+\d+\b)(.*)'
+)
+_WS_RE = re.compile(r'\s+') # Whitespace runs
+# Deletes every ASCII character not allowed in filenames (titles are ASCII-folded first)
+_UNSAFE_CHARS_TABLE = str.maketrans('', '', ''.join(
+    c for c in map(chr, range(128)) if c not in string.ascii_letters + string.digits + '_-'
+))
+_SCAN_BLOCKS = 5 # Only the topmost text blocks of each page are searched for a heading
+_SCAN_CHUNK_PAGES = 64 # Pages handed to a scanning worker process at a time
+_MAX_WRITE_WORKERS = 8 # Upper bound on processes writing sections at once
+
 def select_file_and_directory():
     """
     Opens file dialogs for the user to select an input PDF and an output folder.
     Returns the file path and directory path as a tuple.
     """
-    root = tk.Tk()
-    root.withdraw() 
+    # Reuse the shared hidden Tkinter root instead of creating a new one
+    _tkroot.root()
     
     input_pdf_path = filedialog.askopenfilename(
         title="Select a PDF file",
@@ -35,103 +54,142 @@ def select_file_and_directory():
         
     return input_pdf_path, output_folder_path
 
+def _scan_page_range(pdf_path, start, stop):
+    """
+    Scans pages [start, stop) of the PDF for 'PART' and 'CHAPTER' headings.
+    Runs in a worker process, so it opens its own copy of the document.
+    Returns a list of (page_index, title) tuples in page order.
+    """
+    matches = []
+    with fitz.open(pdf_path) as doc:
+        for i in range(start, stop):
+            try:
+                page = doc.load_page(i)
+                # Work on the page's text blocks instead of its full plain text. Only the few
+                # blocks nearest the top of the page can hold a heading, so the body text is
+                # never handed to the regex. Image blocks (type 1) carry no text.
+                blocks = [b for b in page.get_text("blocks") if b[6] == 0]
+                top_blocks = sorted(blocks, key=lambda b: b[1])[:_SCAN_BLOCKS]
+
+                for n, block in enumerate(top_blocks):
+                    block_text = block[4].strip()
+                    match = _TITLE_RE.match(block_text)
+                    if not match:
+                        continue
+
+                    # Get the exact matched prefix (e.g., "PART 1" or "Chapter 5")
+                    matched_prefix = match.group(1).strip()
+
+                    # The description is the rest of the heading block, or the next block
+                    # down when the heading sits in a block of its own.
+                    description_text = match.group(2)
+                    if not description_text.strip() and n + 1 < len(top_blocks):
+                        description_text = top_blocks[n + 1][4]
+                    # Clean up the description text, removing extra spaces/newlines
+                    description_text = _WS_RE.sub(' ', description_text).strip()[:150]
+
+                    # Combine prefix and description
+                    full_title = f"{matched_prefix} {description_text}" if description_text else matched_prefix
+                    matches.append((i, full_title))
+                    break # Only the first heading on a page starts a section
+
+            except Exception as e:
+                print(f"Warning: Error extracting text from page {i + 1} with PyMuPDF: {e}. Skipping this page for title detection.")
+                continue
+    return matches
+
+def _section_filename(title, start_page_index):
+    """
+    Builds the output filename for a section: a zero-padded page number prefix
+    followed by an ASCII-only, filesystem-safe version of the title.
+    """
+    # NFKD folding is a no-op on plain ASCII titles, which is the common case
+    if title.isascii():
+        normalized_title = title
+    else:
+        normalized_title = unicodedata.normalize('NFKD', title).encode('ascii', 'ignore').decode('utf-8')
+    safe_title = _WS_RE.sub('_', normalized_title)
+    safe_title = safe_title.translate(_UNSAFE_CHARS_TABLE)
+    safe_title = safe_title.strip('_') 
+    safe_title = safe_title[:90] 
+
+    page_number_str = f"Page_{start_page_index + 1:04d}"
+
+    return f"{page_number_str}_{safe_title}.pdf"
+
+def _write_section(pdf_path, start_page_index, end_page_index, output_path):
+    """
+    Writes pages [start_page_index, end_page_index) of the PDF to output_path.
+    Runs in a worker process, so it opens its own copy of the source document.
+    """
+    with fitz.open(pdf_path) as doc, fitz.open() as new_pdf:
+        new_pdf.insert_pdf(doc, 
+                           from_page=start_page_index, 
+                           to_page=end_page_index - 1)
+        # PyMuPDF's default save options, pinned explicitly so the streams copied by
+        # insert_pdf keep being written out as-is
+        new_pdf.save(output_path, garbage=0, deflate=False, clean=False)
+
 def split_pdf_by_content(input_pdf_path, output_folder):
     """
     Splits a PDF into multiple smaller PDFs by finding only 'PART' and 'CHAPTER' titles in the content.
     Includes enhanced filename sanitization, page numbers in the filenames, and captures
     contextual text for titles by explicitly searching for text immediately after the heading.
     """
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder)
+    os.makedirs(output_folder, exist_ok=True)
 
     try:
         doc = fitz.open(input_pdf_path)
-        
-        # Regex to find PART/CHAPTER prefix, with a capturing group for the number (Roman or Arabic)
-        # This will help us find the exact match and then extract text AFTER it.
-        prefix_pattern = re.compile(
-            r'^\s*(PART\s+(?:[IVXLCDM]+\b|\d+\b)|Chapter\s+\d+\b)', 
-            re.IGNORECASE | re.MULTILINE 
-        )
+        n_pages = doc.page_count # Looked up once; len(doc) calls into MuPDF every time
 
         split_points = []
+        last_hit = -1 # Page index of the most recent split point
         
         print(f"Analyzing PDF for 'PART' and 'CHAPTER' titles in '{input_pdf_path}' using PyMuPDF...")
-        for i in tqdm(range(len(doc)), desc="Scanning pages for titles"):
-            try:
-                page = doc.load_page(i)
-                # Extract a larger chunk of text from the page (e.g., first 500 chars)
-                # This helps ensure the descriptive text is included even if it's on a new line.
-                full_page_text = page.get_text("text") 
-                if not full_page_text:
-                    continue
-                    
-                # Search for the prefix pattern within the full page text
-                match = prefix_pattern.search(full_page_text)
-                if match:
-                    # Get the exact matched prefix (e.g., "PART 1" or "Chapter 5")
-                    matched_prefix = match.group(0).strip()
-                    
-                    # Get the text immediately following the prefix match
-                    # We'll take a chunk of text to find the descriptive part
-                    text_after_prefix = full_page_text[match.end():].strip()
-                    
-                    # Try to extract a few words for context.
-                    # We'll look for the first line of text after the heading, or the first 50 characters.
-                    description_match = re.match(r'(.{1,150})(?=\n|$)', text_after_prefix, re.DOTALL | re.IGNORECASE)
-                    description_text = ""
-                    if description_match:
-                        # Clean up the description text, removing extra spaces/newlines
-                        description_text = re.sub(r'\s+', ' ', description_match.group(1)).strip()
-
-                    # Combine prefix and description
-                    full_title = f"{matched_prefix} {description_text}" if description_text else matched_prefix
-
-                    if not split_points or split_points[-1]['start_page'] != i:
-                        split_points.append({'title': full_title, 'start_page': i})
-                        
-            except Exception as e:
-                print(f"Warning: Error extracting text from page {i + 1} with PyMuPDF: {e}. Skipping this page for title detection.")
-                continue
+        # Text extraction dominates on large books, so page ranges are scanned in parallel
+        # worker processes. map() yields results in submission order, so the matches come
+        # back already sorted by page index.
+        range_starts = range(0, n_pages, _SCAN_CHUNK_PAGES)
+        range_stops = [min(start + _SCAN_CHUNK_PAGES, n_pages) for start in range_starts]
+        with ProcessPoolExecutor() as executor, tqdm(total=n_pages, desc="Scanning pages for titles") as pbar:
+            results = executor.map(_scan_page_range, repeat(input_pdf_path), range_starts, range_stops)
+            for start, stop, matches in zip(range_starts, range_stops, results):
+                for page_index, full_title in matches:
+                    if page_index != last_hit:
+                        split_points.append({'title': full_title, 'start_page': page_index})
+                        last_hit = page_index
+                pbar.update(stop - start)
 
         if not split_points:
             messagebox.showinfo("Information", "No suitable 'PART' or 'CHAPTER' titles found for splitting. Please ensure these headings exist in your document and review the PDF content for any unusual formatting.")
             return
 
-        split_points.append({'title': 'END_OF_DOCUMENT', 'start_page': len(doc)})
+        split_points.append({'title': 'END_OF_DOCUMENT', 'start_page': n_pages})
 
         print(f"Found {len(split_points) - 1} potential split points. Starting PDF splitting...")
+        # Work out every section and its output filename up front, so empty sections are
+        # dropped before an output document is ever created for them
+        sections = []
+        output_prefix = os.path.join(output_folder, '') # Folder path with a trailing separator
         for i in range(len(split_points) - 1):
             start_page_index = split_points[i]['start_page']
             end_page_index = split_points[i+1]['start_page']
             title = split_points[i]['title']
-            
-            new_pdf = fitz.open()
-            
-            if end_page_index > start_page_index:
-                with tqdm(total=end_page_index - start_page_index, desc=f"Writing '{title[:30]}...'") as pbar:
-                    new_pdf.insert_pdf(doc, 
-                                       from_page=start_page_index, 
-                                       to_page=end_page_index - 1)
-                    pbar.update(end_page_index - start_page_index)
-
-                normalized_title = unicodedata.normalize('NFKD', title).encode('ascii', 'ignore').decode('utf-8')
-                safe_title = re.sub(r'\s+', '_', normalized_title) 
-                safe_title = re.sub(r'[^a-zA-Z0-9_\-]', '', safe_title) 
-                safe_title = safe_title.strip('_') 
-                safe_title = safe_title[:90] 
-
-                page_number_str = f"Page_{start_page_index + 1:04d}"
 
-                filename = f"{page_number_str}_{safe_title}.pdf"
-                output_path = os.path.join(output_folder, filename)
-
-                new_pdf.save(output_path)
-                print(f"Created '{output_path}' with pages {start_page_index + 1} to {end_page_index}.")
+            if end_page_index > start_page_index:
+                output_path = output_prefix + _section_filename(title, start_page_index)
+                sections.append((start_page_index, end_page_index, output_path))
             else:
                 print(f"Skipping empty section: '{title}' (pages {start_page_index + 1} to {end_page_index}).")
-            
-            new_pdf.close()
+
+        # Sections don't depend on each other, so they're written in parallel. PyMuPDF isn't
+        # thread-safe, so this uses worker processes, each with its own copy of the source.
+        with ProcessPoolExecutor(max_workers=min(_MAX_WRITE_WORKERS, os.cpu_count() or 1)) as executor:
+            futures = [executor.submit(_write_section, input_pdf_path, start_page_index, end_page_index, output_path)
+                       for start_page_index, end_page_index, output_path in sections]
+            for (start_page_index, end_page_index, output_path), future in zip(sections, futures):
+                future.result() # Re-raises any error from the worker
+                print(f"Created '{output_path}' with pages {start_page_index + 1} to {end_page_index}.")
         
         doc.close()
         messagebox.showinfo("Success", "PDF splitting complete!")
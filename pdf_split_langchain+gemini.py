@@ -1,118 +1,610 @@
+import io
 import os
+import sys
+import re
 import json
-import tkinter as tk
+import logging
+import time
+import asyncio
+import hashlib
+import datetime
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
 from tkinter import filedialog, messagebox
-from PyPDF2 import PdfReader, PdfWriter
-from langchain_community.document_loaders import PyPDFLoader
+import _tkroot # Shared, lazily created hidden Tk root
+from pypdf import PdfReader, PdfWriter
+from google.generativeai import caching
 from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_core.messages import SystemMessage
 from langchain_core.prompts import ChatPromptTemplate
 from tqdm import tqdm
 
-def select_file_and_directory():
+# Lines that look like headings: "Chapter 3", "Section 2", numbered headings such as "4.1 Scope",
+# or a whole line in capitals. Only these lines, not the full page text, are sent to Gemini.
+_HEADING_RE = re.compile(
+    r'^(?:(?i:chapter\s+\w+|section\s+\d)|\d+(?:\.\d+){0,3}\s+\S|[A-Z][A-Z0-9 \-:]{4,}$)'
+)
+_MAX_HEADING_LEN = 120 # Longer lines are body text, not headings
+# Start of the JSON object in a response; Gemini often puts a ```json fence or a sentence before it
+_JSON_START_RE = re.compile(r'\{')
+_JSON_DECODER = json.JSONDecoder()
+# A printed table-of-contents entry with a dotted leader, e.g. "Introduction ........ 42"
+_TOC_ENTRY_RE = re.compile(r'^(.{3,120}?)\s*(?:\.\s*){2,}(\d+)\s*$', re.MULTILINE)
+_TOC_SCAN_PAGES = 10 # A printed table of contents is looked for on the first pages only
+_MIN_TOC_ENTRIES = 3 # Fewer matching lines than this are more likely body text than a TOC
+
+# Explicit context caching needs a fixed model version rather than a -latest alias
+_MODEL_NAME = "gemini-1.5-flash-001"
+_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "pdf-splitters")
+_CONTEXT_CACHE_INDEX = os.path.join(_CACHE_DIR, "context_caches.json") # Payload hash -> live Gemini cache
+_CONTEXT_CACHE_TTL = datetime.timedelta(minutes=10)
+# Batches look up their context caches from worker threads at the same time, and the
+# index is read, updated and rewritten as a whole
+_CONTEXT_CACHE_LOCK = threading.Lock()
+# Gemini won't cache fewer than 32,768 input tokens. At roughly 4 characters per token,
+# anything smaller is sent inline with the request instead.
+_MIN_CACHED_CHARS = 32768 * 4
+
+_SYSTEM_PROMPT = (
+    "You are a document analysis assistant. You are given heading-candidate lines from one or more documents. "
+    "Each document starts with a [doc=<ID>] line, and each of its lines is prefixed with [p<N>] where N is the page "
+    "it appears on. Your task is to pick out all chapter titles, section headings, and subheadings of each document "
+    "and list them with their page numbers. Provide the output as a JSON object {doc_id: {title: page}} where each key "
+    "is a document ID and the value is an object whose keys are that document's titles and whose values are their "
+    "corresponding page numbers."
+)
+_USER_PROMPT = (
+    "Analyze the following documents and return a JSON object with all titles and their page numbers for each document. "
+    "Here are the documents:\n\n{document_text}"
+)
+# Used when the documents are already in the context cache along with the system prompt
+_CACHED_USER_PROMPT = (
+    "Analyze the documents you were given and return a JSON object with all titles and their page numbers for each document."
+)
+# Bump whenever the prompts or the heading filter change, so results cached from an
+# older prompt aren't reused
+_PROMPT_VERSION = 2
+# Documents whose heading candidates share one Gemini request, so the per-request
+# round trip is paid once per batch rather than once per file
+_MAX_DOCS_PER_REQUEST = 10
+# Long documents are sent as overlapping page-range chunks, each its own entry in a batch,
+# so no single request grows with the length of the book and the chunks run concurrently
+_CHUNK_PAGES = 100
+_CHUNK_OVERLAP_PAGES = 10
+# Number of batch requests in flight with Gemini at the same time; more than this runs
+# into the API's rate limits, and one failed request fails every file in its batch
+_MAX_CONCURRENT_REQUESTS = 8
+_HASH_CHUNK_SIZE = 1024 * 1024 # Read the PDF in 1 MiB chunks when hashing it
+_WRITE_BUFFER_SIZE = 1024 * 1024 # pypdf writes many small pieces; batch them into 1 MiB writes
+_EXTRACT_CHUNK_PAGES = 32 # Pages handed to a text-extraction worker process at a time
+_MAX_SUMMARY_ERRORS = 10 # Failures listed in the final dialog; the rest are only logged
+
+logger = logging.getLogger("pdf_split")
+
+def select_files_and_directory():
     """
-    Opens file dialogs for the user to select an input PDF and an output folder.
-    Returns the file path and directory path as a tuple.
+    Opens file dialogs for the user to select one or more input PDFs and an output folder.
+    Returns the list of file paths and the directory path as a tuple.
     """
-    root = tk.Tk()
-    root.withdraw()
+    # Reuse the shared hidden Tkinter root instead of creating a new one
+    _tkroot.root()
 
-    input_pdf_path = filedialog.askopenfilename(
-        title="Select a PDF file",
+    input_pdf_paths = filedialog.askopenfilenames(
+        title="Select one or more PDF files",
         filetypes=[("PDF files", "*.pdf")]
     )
 
-    if not input_pdf_path:
+    if not input_pdf_paths:
         return None, None
 
     output_folder_path = filedialog.askdirectory(
-        title="Select an output folder to save the processed PDF"
+        title="Select an output folder to save the processed PDFs"
     )
 
     if not output_folder_path:
         return None, None
 
-    return input_pdf_path, output_folder_path
+    return list(input_pdf_paths), output_folder_path
+
+def _context_cache_key(document_text):
+    """
+    Identifies a request payload by its contents. A batch can hold page-range chunks
+    of several files, so the text itself, not the file paths, decides whether an
+    existing cache matches.
+    """
+    return hashlib.sha256(f"{_MODEL_NAME}\0{document_text}".encode("utf-8")).hexdigest()
+
+def _write_json_atomically(path, data):
+    """
+    Writes data as JSON to a temporary file in the cache directory and renames it
+    over path, so an interrupted run never leaves a truncated file behind.
+    """
+    os.makedirs(_CACHE_DIR, exist_ok=True)
+    tmp_file = tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=_CACHE_DIR, suffix=".tmp", delete=False)
+    try:
+        with tmp_file:
+            json.dump(data, tmp_file)
+        os.replace(tmp_file.name, path)
+    except BaseException:
+        if os.path.exists(tmp_file.name):
+            os.remove(tmp_file.name)
+        raise
+
+def _get_context_cache(document_text):
+    """
+    Returns the name of a Gemini context cache holding the system prompt and the
+    batch's heading-candidate lines. A cache created by an earlier run with the same
+    payload is reused while it is still alive; otherwise a new one is created and
+    recorded in the index file.
+    """
+    key = _context_cache_key(document_text)
+    # Held across the lookup and the create, so concurrent batches don't drop each
+    # other's index entries or create the same cache twice
+    with _CONTEXT_CACHE_LOCK:
+        try:
+            with open(_CONTEXT_CACHE_INDEX, encoding="utf-8") as index_file:
+                index = json.load(index_file)
+        except (OSError, ValueError):
+            index = {}
+
+        # Forget expired caches, leaving a minute of slack so a cache doesn't expire mid-request
+        cutoff = time.time() + 60
+        index = {k: entry for k, entry in index.items() if entry["expire_time"] > cutoff}
+        if key in index:
+            return index[key]["name"]
+
+        cache = caching.CachedContent.create(
+            model=f"models/{_MODEL_NAME}",
+            system_instruction=_SYSTEM_PROMPT,
+            contents=[document_text],
+            ttl=_CONTEXT_CACHE_TTL,
+        )
+        index[key] = {"name": cache.name, "expire_time": cache.expire_time.timestamp()}
+        _write_json_atomically(_CONTEXT_CACHE_INDEX, index)
+        return cache.name
+
+def _file_sha256(path):
+    """
+    Returns the SHA-256 hex digest of the file's contents, streamed from disk so
+    large PDFs aren't loaded into memory at once.
+    """
+    with open(path, 'rb') as f:
+        if sys.version_info >= (3, 11):
+            # file_digest reads into a reused buffer with the GIL released
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+        return digest.hexdigest()
+
+def _results_cache_path(file_hash):
+    """
+    Returns where the parsed bookmarks for a PDF with the given content hash are cached.
+    """
+    return os.path.join(_CACHE_DIR, f"{file_hash}-{_MODEL_NAME}-v{_PROMPT_VERSION}.json")
 
-def add_bookmarks_with_langchain(input_pdf_path, output_folder):
+def _load_cached_bookmarks(cache_path):
     """
-    Uses LangChain and Gemini to analyze a PDF and add sub-bookmarks.
-    This script is designed to process a single PDF.
+    Returns the bookmarks cached at cache_path, or None if there's no usable entry.
     """
     try:
-        # Step 1: Initialize the AI model and LangChain components
-        model = ChatGoogleGenerativeAI(model="gemini-1.5-flash-latest", temperature=0)
-        
-        # Step 2: Load and extract text from the PDF using PyPDFLoader
-        print("Loading and extracting text from the PDF...")
-        loader = PyPDFLoader(input_pdf_path)
-        pages = loader.load_and_split()
-        
-        # Concatenate all page content for the AI to analyze
-        full_text = " ".join([page.page_content for page in pages])
-
-        # Step 3: Define the prompt for the AI
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", 
-             "You are a document analysis assistant. Your task is to extract all chapter titles, section headings, "
-             "and subheadings from the document and list them with their page numbers. "
-             "Provide the output as a JSON object where each key is a title and the value is its corresponding page number."),
-            ("user", 
-             "Analyze the following document and return a JSON object with a list of all titles and their page numbers. "
-             "Here is the content:\n\n{document_text}")
-        ])
-        
-        # Step 4: Create and invoke the chain
-        print("Sending content to Gemini for analysis...")
+        with open(cache_path, encoding="utf-8") as cache_file:
+            return json.load(cache_file)
+    except (OSError, ValueError):
+        return None
+
+def _store_cached_bookmarks(cache_path, bookmark_data):
+    """
+    Caches the parsed bookmarks at cache_path. The entry is written to a temporary
+    file and renamed into place, so an interrupted run never leaves a truncated entry.
+    """
+    _write_json_atomically(cache_path, bookmark_data)
+
+def _printed_toc(reader):
+    """
+    Looks for a printed table of contents on the first _TOC_SCAN_PAGES pages and
+    returns its entries as {title: page_number}, or None if there isn't one.
+    Printed page numbers are mapped to physical pages through the page labels, so
+    front matter numbered separately doesn't shift the bookmarks.
+    """
+    label_pages = {}
+    for page_index, label in enumerate(reader.page_labels):
+        label_pages.setdefault(label, page_index + 1)
+
+    toc = {}
+    for page_index in range(min(_TOC_SCAN_PAGES, len(reader.pages))):
+        text = reader.pages[page_index].extract_text() or ""
+        for match in _TOC_ENTRY_RE.finditer(text):
+            page_num = label_pages.get(match.group(2))
+            if page_num is not None:
+                toc.setdefault(match.group(1).strip(), page_num)
+    return toc if len(toc) >= _MIN_TOC_ENTRIES else None
+
+_worker_reader = None # A text-extraction worker process's own reader for the PDF
+
+def _open_worker_reader(pdf_path):
+    """
+    Initializer of a text-extraction worker process. pypdf reads and parses the whole
+    file when a reader is created, so each worker does that once, not once per range.
+    """
+    global _worker_reader
+    _worker_reader = PdfReader(pdf_path, strict=False)
+
+def _extract_page_range(start, stop):
+    """
+    Extracts the text of pages [start, stop) of the PDF with the worker's reader.
+    """
+    return [_worker_reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+def _heading_candidates(input_pdf_path, reader):
+    """
+    Extracts the PDF's text and returns each page's heading-candidate lines as one
+    string per page, every line prefixed with [p<N>] for the page it appears on.
+    """
+    # Extract text from the PDF. extract_text() is pure Python and holds the GIL,
+    # so longer documents are split into page ranges that worker processes extract in
+    # parallel. Results come back in submission order, i.e. already sorted by page.
+    logger.info("Extracting text from '%s'...", os.path.basename(input_pdf_path))
+    n_pages = len(reader.pages)
+    if n_pages <= _EXTRACT_CHUNK_PAGES:
+        texts = [page.extract_text() or "" for page in reader.pages]
+    else:
+        range_starts = range(0, n_pages, _EXTRACT_CHUNK_PAGES)
+        range_stops = [min(start + _EXTRACT_CHUNK_PAGES, n_pages) for start in range_starts]
+        max_workers = min(os.cpu_count() or 1, len(range_starts))
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_open_worker_reader,
+                                 initargs=(input_pdf_path,)) as executor:
+            page_ranges = list(tqdm(executor.map(_extract_page_range, range_starts, range_stops),
+                                    total=len(range_starts), desc="Extracting text"))
+        texts = [text for page_range in page_ranges for text in page_range]
+    
+    # Collect the heading-candidate lines for the AI to analyze, each tagged with its
+    # 1-based page number. Pages stay separate so they can be split into chunks.
+    page_candidates = []
+    for page_num, text in enumerate(texts, 1):
+        candidates = []
+        for line in text.splitlines():
+            line = line.strip()
+            if len(line) < _MAX_HEADING_LEN and _HEADING_RE.match(line):
+                candidates.append(f"[p{page_num}] {line}\n")
+        page_candidates.append("".join(candidates))
+    return page_candidates
+
+def _page_chunks(page_candidates):
+    """
+    Splits a document's per-page heading candidates into overlapping chunks of
+    _CHUNK_PAGES pages and returns the text of each chunk. A heading near a chunk
+    boundary is seen whole by at least one chunk. Chunks without any candidates are
+    left out, since a request for them could only come back empty.
+    """
+    step = _CHUNK_PAGES - _CHUNK_OVERLAP_PAGES
+    n_pages = len(page_candidates)
+    chunks = ("".join(page_candidates[start:start + _CHUNK_PAGES])
+              for start in range(0, max(n_pages - _CHUNK_OVERLAP_PAGES, 1), step))
+    return [chunk_text for chunk_text in chunks if chunk_text]
+
+def _batch_document_text(document_texts):
+    """
+    Joins the heading-candidate lines of several documents into one payload, each
+    document introduced by a [doc=<ID>] line with 1-based IDs.
+    """
+    text_buffer = io.StringIO()
+    write = text_buffer.write
+    for doc_id, document_text in enumerate(document_texts, 1):
+        write(f"---\n[doc={doc_id}]\n")
+        write(document_text)
+    return text_buffer.getvalue()
+
+async def _ask_gemini(document_texts, semaphore, pbar):
+    """
+    Sends the heading-candidate lines of a batch of documents (or page-range chunks
+    of them) to Gemini in a single request and returns the text of its response.
+    The response is streamed, and pbar advances by each piece's length as it arrives.
+    Requests wait on the semaphore, so only so many batches talk to Gemini at once.
+    """
+    full_text = _batch_document_text(document_texts)
+
+    async with semaphore:
+        # Initialize the AI model and define the prompt. Large payloads go into a
+        # Gemini context cache, so re-running on the same PDFs doesn't re-send and re-bill
+        # the document tokens; the request then only carries the instruction.
+        if len(full_text) >= _MIN_CACHED_CHARS:
+            cache_name = await asyncio.to_thread(_get_context_cache, full_text)
+            model = ChatGoogleGenerativeAI(model=_MODEL_NAME, temperature=0, cached_content=cache_name)
+            prompt = ChatPromptTemplate.from_messages([("user", _CACHED_USER_PROMPT)])
+        else:
+            model = ChatGoogleGenerativeAI(model=_MODEL_NAME, temperature=0)
+            prompt = ChatPromptTemplate.from_messages([
+                SystemMessage(content=_SYSTEM_PROMPT), # A message object, so its braces aren't template fields
+                ("user", _USER_PROMPT)
+            ])
+
+        # Create and invoke the chain
         chain = prompt | model
-        
-        # Use a simple progress bar for the AI call
-        with tqdm(total=1, desc="Analyzing with Gemini") as pbar:
-            response = chain.invoke({"document_text": full_text})
-            pbar.update(1)
+        response_parts = []
+        async for chunk in chain.astream({"document_text": full_text}):
+            response_parts.append(chunk.content)
+            pbar.update(len(chunk.content))
+        return "".join(response_parts)
 
-        # Step 5: Parse the AI's JSON response
+def _parse_json_object(content):
+    """
+    Decodes the JSON object in a Gemini response. The response might be enclosed in a
+    markdown code block or a sentence, so decoding starts at the first '{' and
+    whatever follows the object is ignored.
+    """
+    json_start = _JSON_START_RE.search(content)
+    if json_start is None:
+        raise json.JSONDecodeError("No JSON object found", content, 0)
+    parsed, _ = _JSON_DECODER.raw_decode(content, json_start.start())
+    return parsed
+
+def _build_writer(reader):
+    """
+    Returns a PdfWriter for adding bookmarks to the reader's document.
+    """
+    # In incremental mode the writer starts from the original file and, when written,
+    # appends only the objects that changed (the new outline) plus a fresh xref section,
+    # instead of serializing every page again
+    return PdfWriter(reader, incremental=True)
+
+def add_bookmarks(reader, output_path, bookmark_data, writer=None):
+    """
+    Adds the {title: page_number} bookmarks that fall inside the reader's document and,
+    if there are any, saves the result to output_path. The same reader supplies the
+    pages, so the file isn't parsed again; a writer already built from it with
+    _build_writer() can be passed in. Returns the number of bookmarks added.
+    """
+    if writer is None:
+        writer = _build_writer(reader)
+
+    # pypdf uses 0-indexed pages internally. Out-of-range pages are dropped up front, and
+    # the rest are added in page order whatever order the analysis listed them in; the
+    # sort is stable, so headings on the same page keep their relative order.
+    n_pages = len(reader.pages)
+    entries = sorted(((page_num - 1, title) for title, page_num in bookmark_data.items()
+                      if 0 < page_num <= n_pages), key=itemgetter(0))
+    add_outline_item = writer.add_outline_item
+    for page_index, title in entries:
+        add_outline_item(title, page_index)
+    bookmarks_added = len(entries)
+
+    if bookmarks_added:
+        # Write next to the destination and rename into place, so a failure part-way
+        # through never leaves a truncated PDF at output_path
+        tmp_path = output_path + ".tmp"
         try:
-            # The response might be enclosed in markdown code block
-            json_string = response.content.strip('```json').strip('```').strip()
-            bookmark_data = json.loads(json_string)
-        except (json.JSONDecodeError, AttributeError):
-            messagebox.showerror("Error", "Could not parse Gemini's response. The format might be incorrect.")
-            return
-
-        # Step 6: Add the new bookmarks to the PDF using PyPDF2
-        print("Adding new bookmarks to the PDF...")
-        writer = PdfWriter()
-        reader = PdfReader(input_pdf_path)
-
-        for page in reader.pages:
-            writer.add_page(page)
-
-        # PyPDF2 uses 0-indexed pages internally
-        bookmarks_added = 0
-        for title, page_num in bookmark_data.items():
-            page_index = page_num - 1
-            if 0 <= page_index < len(reader.pages):
-                writer.add_outline_entry(title, page_index)
-                bookmarks_added += 1
-                
-        if bookmarks_added == 0:
-            messagebox.showinfo("Information", "Gemini analysis complete, but no valid bookmarks were found to add.")
-            return
-
-        # Save the updated PDF
-        output_path = os.path.join(output_folder, f"updated_{os.path.basename(input_pdf_path)}")
-        with open(output_path, 'wb') as output_file:
-            writer.write(output_file)
-
-        messagebox.showinfo("Success", f"New bookmarks added to '{os.path.basename(output_path)}'!")
+            with open(tmp_path, 'wb', buffering=_WRITE_BUFFER_SIZE) as output_file:
+                writer.write(output_file)
+                output_file.flush()
+                os.fsync(output_file.fileno())
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    return bookmarks_added
+
+def _format_errors(errors):
+    """
+    Formats the first _MAX_SUMMARY_ERRORS per-file failures for a dialog, or returns
+    an empty string if there are none.
+    """
+    if not errors:
+        return ""
+    text = "\n\n" + "\n".join(errors[:_MAX_SUMMARY_ERRORS])
+    if len(errors) > _MAX_SUMMARY_ERRORS:
+        text += f"\n...and {len(errors) - _MAX_SUMMARY_ERRORS} more (see the console)."
+    return text
+
+async def add_bookmarks_with_langchain(input_pdf_paths, output_folder):
+    """
+    Uses LangChain and Gemini to analyze PDFs and add sub-bookmarks.
+    Long PDFs are split into page-range chunks, and the heading candidates of up to
+    _MAX_DOCS_PER_REQUEST PDFs or chunks are sent to Gemini in a single request.
+    A single path is accepted as well as a list of them.
+    Per-file outcomes are logged, and one summary dialog is shown at the end.
+    """
+    if isinstance(input_pdf_paths, str):
+        input_pdf_paths = [input_pdf_paths]
+
+    # Per-file failures are collected for the summary dialog rather than shown one
+    # dialog at a time, which would block the run until each is dismissed
+    errors = []
+    def fail(path, reason):
+        message = f"{os.path.basename(path)}: {reason}"
+        logger.error(message)
+        errors.append(message)
+
+    try:
+        readers = {}
+        results_cache_paths = {}
+        bookmark_data = {}
+        skipped = 0
+        # Step 1: Load each PDF and reuse a cached analysis or printed table of contents
+        # where there is one
+        for input_pdf_path in input_pdf_paths:
+            logger.info("Loading '%s'...", os.path.basename(input_pdf_path))
+            # A file that can't be read is reported and left out, rather than ending the run
+            # for the whole selection
+            try:
+                # Non-strict parsing tolerates the minor spec violations common in real-world PDFs.
+                # Page content streams are only decoded if text is extracted, which a cache hit skips.
+                reader = PdfReader(input_pdf_path, strict=False)
+
+                # A PDF that already has an outline needs nothing from Gemini. The output keeps
+                # the original outline, so adding its entries again would only duplicate them.
+                if reader.outline:
+                    logger.info("'%s' already has bookmarks. Skipping.", os.path.basename(input_pdf_path))
+                    skipped += 1
+                    continue
+
+                # Gemini's analysis of a given file is cached on disk, keyed by the file's contents,
+                # so a re-run on the same PDF skips text extraction and the LLM call entirely
+                results_cache_path = _results_cache_path(_file_sha256(input_pdf_path))
+                file_bookmarks = _load_cached_bookmarks(results_cache_path)
+                if file_bookmarks is not None:
+                    logger.info("Using the cached Gemini analysis for '%s'...", os.path.basename(input_pdf_path))
+                else:
+                    # A table of contents printed in the document can be read without the LLM
+                    file_bookmarks = _printed_toc(reader)
+                    if file_bookmarks is not None:
+                        logger.info("Using the table of contents printed in '%s'...", os.path.basename(input_pdf_path))
+            except Exception as e:
+                fail(input_pdf_path, f"Could not read the PDF: {e}")
+                continue
+
+            readers[input_pdf_path] = reader
+            results_cache_paths[input_pdf_path] = results_cache_path
+            if file_bookmarks is not None:
+                bookmark_data[input_pdf_path] = file_bookmarks
+
+        # Step 2: Collect the heading candidates of every PDF that still needs analyzing,
+        # split long ones into page-range chunks, and group the chunks into batches that
+        # each go to Gemini in one request
+        pending = []
+        chunks = []
+        for path in [path for path in readers if path not in bookmark_data]:
+            try:
+                file_chunks = _page_chunks(_heading_candidates(path, readers[path]))
+            except Exception as e:
+                fail(path, f"Could not extract the PDF's text: {e}")
+                del readers[path]
+                continue
+            if not file_chunks:
+                # Nothing in the text looks like a heading, so there's nothing to ask Gemini
+                fail(path, "No heading-like lines were found in the PDF's text.")
+                del readers[path]
+                continue
+            pending.append(path)
+            chunks.extend((path, chunk_text) for chunk_text in file_chunks)
+        batches = [chunks[i:i + _MAX_DOCS_PER_REQUEST] for i in range(0, len(chunks), _MAX_DOCS_PER_REQUEST)]
+        paths = list(readers) # Every file that gets bookmarked, in the order given
+
+        # Step 3: Send the batches to Gemini
+        if batches:
+            logger.info("Sending content to Gemini for analysis...")
+        # The response length isn't known up front, so the bar counts characters received
+        with tqdm(desc="Analyzing with Gemini", unit="char", unit_scale=True, disable=not batches) as pbar:
+            # Waiting on Gemini dominates the run, so the output writers are set up in worker
+            # threads while the requests are in flight. The readers are no longer used for
+            # extraction by then, and each thread only touches its own file's reader.
+            semaphore = asyncio.Semaphore(_MAX_CONCURRENT_REQUESTS)
+            llm_tasks = [asyncio.create_task(_ask_gemini([chunk_text for _, chunk_text in batch], semaphore, pbar))
+                         for batch in batches]
+            try:
+                writer_results = await asyncio.gather(*(asyncio.to_thread(_build_writer, readers[path])
+                                                        for path in paths), return_exceptions=True)
+                responses = await asyncio.gather(*llm_tasks, return_exceptions=True)
+            finally:
+                # If the run is aborted, don't leave requests running in the background
+                for task in llm_tasks:
+                    task.cancel()
+                await asyncio.gather(*llm_tasks, return_exceptions=True)
+
+        writers = {}
+        for path, writer in zip(paths, writer_results):
+            if isinstance(writer, Exception):
+                fail(path, f"Could not prepare the output PDF: {writer}")
+            else:
+                writers[path] = writer
+
+        # Step 4: Parse the AI's JSON response, one {title: page} object per document ID, and
+        # merge each file's chunks. Page numbers come from the [p<N>] tags, so they're already
+        # absolute. A file is only bookmarked if every one of its chunks came back.
+        merged = {path: {} for path in pending}
+        chunk_errors = {}
+        for batch, response in zip(batches, responses):
+            batch_paths = [path for path, _ in batch]
+            if isinstance(response, Exception):
+                for path in batch_paths:
+                    chunk_errors.setdefault(path, f"An error occurred with Gemini: {response}")
+                continue
+            try:
+                batch_results = _parse_json_object(response)
+            except json.JSONDecodeError:
+                for path in batch_paths:
+                    chunk_errors.setdefault(path, "Could not parse Gemini's response. The format might be incorrect.")
+                continue
+
+            if not isinstance(batch_results, dict):
+                batch_results = {}
+            # The prompt tags each document as [doc=<ID>], and Gemini sometimes echoes the
+            # tag back as the key, so "1", "doc=1" and "[doc=1]" all mean document 1
+            batch_results = {str(key).strip().strip("[]").removeprefix("doc=").strip(): value
+                             for key, value in batch_results.items()}
+            for doc_id, path in enumerate(batch_paths, 1):
+                doc_bookmarks = batch_results.get(str(doc_id))
+                if not isinstance(doc_bookmarks, dict):
+                    continue # A chunk of pages without any headings
+                file_bookmarks = merged[path]
+                for title, page_num in doc_bookmarks.items():
+                    # Overlapping chunks can both report a heading; keep its earliest page
+                    if isinstance(page_num, int) and page_num < file_bookmarks.get(title, page_num + 1):
+                        file_bookmarks[title] = page_num
+
+        for path in pending:
+            if path in chunk_errors:
+                fail(path, chunk_errors[path])
+            elif not merged[path]:
+                fail(path, "Gemini returned no headings for this file.")
+            else:
+                bookmark_data[path] = merged[path]
+                # The cache only saves a later run the request; failing to write it
+                # mustn't cost this run the analysis it has already paid for
+                try:
+                    _store_cached_bookmarks(results_cache_paths[path], merged[path])
+                except OSError as e:
+                    logger.warning("Could not cache the Gemini analysis for '%s': %s", os.path.basename(path), e)
+
+        # Free the parsed PDFs of the files that won't be written as soon as that's known,
+        # rather than holding every one of them until the end of the run
+        for path in paths:
+            if path not in bookmark_data or path not in writers:
+                readers.pop(path, None)
+                writers.pop(path, None)
+
+        # Step 5: Add the new bookmarks to each PDF using pypdf. Each file has its own reader
+        # and writer, so they're written from worker threads side by side.
+        logger.info("Adding new bookmarks to the PDFs...")
+        async def write(path, output_path):
+            # Hand the reader and writer over to the worker thread, so each file's parsed
+            # PDF is released as soon as it's written instead of at the end of the run
+            reader, writer = readers.pop(path), writers.pop(path)
+            return await asyncio.to_thread(add_bookmarks, reader, output_path, bookmark_data[path], writer)
+
+        to_write = [path for path in paths if path in writers]
+        output_paths = [os.path.join(output_folder, f"updated_{os.path.basename(path)}") for path in to_write]
+        results = await asyncio.gather(*(write(path, output_path)
+                                         for path, output_path in zip(to_write, output_paths)),
+                                       return_exceptions=True)
+
+        succeeded = 0
+        for path, output_path, bookmarks_added in zip(to_write, output_paths, results):
+            if isinstance(bookmarks_added, Exception):
+                fail(path, f"An error occurred adding bookmarks: {bookmarks_added}")
+            elif bookmarks_added == 0:
+                fail(path, "Analysis complete, but no valid bookmarks were found to add.")
+            else:
+                logger.info("New bookmarks added to '%s'.", os.path.basename(output_path))
+                succeeded += 1
+
+        summary = f"{succeeded} succeeded, {len(errors)} failed."
+        if skipped:
+            summary += f" Skipped (already bookmarked): {skipped}."
+        messagebox.showinfo("Done", summary + _format_errors(errors))
 
     except Exception as e:
-        messagebox.showerror("Error", f"An error occurred: {e}")
+        # Still report the per-file failures collected before the run was aborted
+        messagebox.showerror("Error", f"An error occurred: {e}" + _format_errors(errors))
 
 
 if __name__ == "__main__":
-    input_file, output_directory = select_file_and_directory()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    input_files, output_directory = select_files_and_directory()
 
-    if input_file and output_directory:
+    if input_files and output_directory:
         print("--- Adding bookmarks with LangChain and Gemini ---")
-        add_bookmarks_with_langchain(input_file, output_directory)
\ No newline at end of file
+        asyncio.run(add_bookmarks_with_langchain(input_files, output_directory))
\ No newline at end of file